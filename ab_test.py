@@ -1,20 +1,35 @@
 import numpy as np, pandas as pd
-from scipy import stats
+from scipy.special import chdtrc, stdtr
+
+VARIANT_CATEGORIES = ["C", "T"]
 
 def random_assign_users(users: pd.Series, seed: int = 42, p_treat: float = 0.5) -> pd.DataFrame:
     rng = np.random.default_rng(seed)
     mask = rng.random(len(users)) < p_treat
-    return pd.DataFrame({"user_id": users.values, "variant": np.where(mask, "T","C")})
+    # categorical: 1 byte/row and int8 code-compare instead of object strings
+    variant = pd.Categorical.from_codes(mask.astype(np.int8), categories=VARIANT_CATEGORIES)
+    user_id = users.values.astype(np.int32, copy=False)  # ML user ids fit comfortably
+    return pd.DataFrame({"user_id": user_id, "variant": variant})
+
+NS_PER_DAY = 86400 * 1_000_000_000
 
 def user_metric(events: pd.DataFrame, window_days: int = 7) -> pd.DataFrame:
     # per-user metric = #views in first window_days since their t0
-    ev = events.copy()
-    first_ts = ev.groupby("user_id")["ts"].min().rename("t0")
-    ev = ev.merge(first_ts, on="user_id", how="left")
-    ev["days_since"] = (ev["ts"] - ev["t0"]).dt.total_seconds() / 86400
-    in_win = ev[(ev["event"]=="view") & (ev["days_since"]<=window_days)]
-    m = in_win.groupby("user_id").size().rename("views_w{}".format(window_days)).reset_index()
-    return m
+    # single C-level pass: factorize users, scatter-min for t0, bincount views
+    codes, uniques = pd.factorize(events["user_id"].values, sort=False)
+    ts_i8 = events["ts"].values.view("i8")
+    t0 = np.full(len(uniques), np.iinfo("i8").max, dtype="i8")
+    np.minimum.at(t0, codes, ts_i8)
+    days_since = (ts_i8 - t0[codes]) / NS_PER_DAY
+    view_code = events["event"].cat.categories.get_loc("view")
+    mask = (events["event"].cat.codes.values == view_code) & (days_since <= window_days)
+    counts = np.bincount(codes[mask], minlength=len(uniques))
+    nonzero = counts > 0  # match the old groupby: users with no in-window views drop out
+    order = np.argsort(uniques[nonzero], kind="stable")  # groupby output was user_id-sorted
+    return pd.DataFrame({
+        "user_id": uniques[nonzero][order],
+        "views_w{}".format(window_days): counts[nonzero][order],
+    })
 
 def srm_check(assignments: pd.DataFrame) -> float:
     # chi-square vs expected 50/50
@@ -24,36 +39,59 @@ def srm_check(assignments: pd.DataFrame) -> float:
     expected = np.array([0.5*total, 0.5*total])
     observed = np.array([nT, nC])
     chi2 = ((observed - expected)**2/expected).sum()
-    from scipy.stats import chi2 as chi2dist
-    p = 1 - chi2dist.cdf(chi2, df=1)
-    return float(p)
+    # survival function directly (chdtrc): skips scipy.stats' rv_continuous
+    # dispatch and the 1-cdf cancellation for large chi2
+    return float(chdtrc(1, chi2))
 
 def cuped_adjust(y: pd.Series, x_cov: pd.Series) -> pd.Series:
     # y = experiment-window metric; x = pre-experiment covariate (e.g., views before t0 or earlier slice)
-    theta = (x_cov.cov(y) / (x_cov.var() + 1e-9))
-    return y - theta * x_cov
+    # theta = cov(x,y)/var(x) via two dot products on centered arrays,
+    # instead of separate pandas cov/var passes + Series temporaries
+    yv = np.asarray(y, dtype=np.float64)
+    xv = np.asarray(x_cov, dtype=np.float64)
+    dx = xv - xv.mean()
+    dy = yv - yv.mean()
+    n1 = len(xv) - 1
+    theta = (dx @ dy) / n1 / ((dx @ dx) / n1 + 1e-9)
+    return pd.Series(yv - theta * xv, index=y.index)
 
 def simulate_treatment_effect(metric_df: pd.DataFrame, assignments: pd.DataFrame, lift_pct: float = 0.12, seed: int = 7):
     # apply synthetic lift to T to emulate feature impact
-    df = metric_df.merge(assignments, on="user_id", how="left").fillna("C")
+    df = metric_df.merge(assignments, on="user_id", how="left")
+    df["variant"] = df["variant"].fillna("C")  # stays categorical; "C" is a known category
     rng = np.random.default_rng(seed)
-    base = df["views_w7"].astype(float).values
-    noise = rng.normal(0, 0.5, size=len(df))
-    treated = np.where(df["variant"]=="T", base*(1+lift_pct) + noise, base + noise)
+    # float32 throughout: halves bandwidth and doubles SIMD lanes in np.where
+    base = df["views_w7"].values.astype(np.float32, copy=False)
+    noise = rng.standard_normal(len(df), dtype=np.float32) * np.float32(0.5)
+    is_treat = df["variant"].cat.codes.values == 1
+    treated = np.where(is_treat, base * np.float32(1 + lift_pct) + noise, base + noise)
     df["y"] = treated
     return df
 
-def ttest_and_ci(df: pd.DataFrame):
-    yT = df.loc[df["variant"]=="T","y"].values
-    yC = df.loc[df["variant"]=="C","y"].values
-    t, p = stats.ttest_ind(yT, yC, equal_var=False)
-    lift = (yT.mean() - yC.mean()) / (yC.mean()+1e-9)
+def ttest_and_ci(y: np.ndarray, variant_code: np.ndarray):
+    # variant_code: int8 categorical codes with C=0, T=1; one mask scan
+    # instead of two boolean .loc lookups with label alignment
+    y = np.asarray(y, dtype=np.float64)
+    mask = np.asarray(variant_code) == 1
+    yT = y[mask]
+    yC = y[~mask]
+    # Welch's t-test inlined: reuse the means/variances the CI needs anyway
+    # and get the p-value straight from the Student-t CDF (scipy.special.stdtr)
+    # instead of scipy.stats' generic dispatch.
+    nT, nC = len(yT), len(yC)
+    mT, mC = yT.mean(), yC.mean()
+    seT2 = yT.var(ddof=1) / nT
+    seC2 = yC.var(ddof=1) / nC
+    se = np.sqrt(seT2 + seC2)
+    diff = mT - mC
+    t = diff / se
+    dof = (seT2 + seC2)**2 / (seT2**2/(nT-1) + seC2**2/(nC-1))
+    p = 2 * stdtr(dof, -abs(t))
+    lift = diff / (mC + 1e-9)
     # 95% CI for difference-in-means
-    se = np.sqrt(yT.var(ddof=1)/len(yT) + yC.var(ddof=1)/len(yC))
-    diff = yT.mean() - yC.mean()
     lo, hi = diff - 1.96*se, diff + 1.96*se
     return {
-        "mean_T": float(yT.mean()), "mean_C": float(yC.mean()),
+        "mean_T": float(mT), "mean_C": float(mC),
         "diff": float(diff), "lift_pct": float(lift*100),
         "t_stat": float(t), "p_value": float(p),
         "ci_diff_95": (float(lo), float(hi))
@@ -2,7 +2,10 @@ import numpy as np, pandas as pd
 from typing import Tuple, Dict
 from dataclasses import dataclass
 
+from analytics_kernels import funnel_counts
+
 SECONDS_PER_DAY = 86400
+NS_PER_DAY = SECONDS_PER_DAY * 1_000_000_000
 
 @dataclass
 class PreparedData:
@@ -10,86 +13,127 @@ class PreparedData:
     users: pd.DataFrame
     movies: pd.DataFrame
 
+EVENT_CATEGORIES = ["view", "like", "comment"]
+
 def prepare_events(ratings: pd.DataFrame, users: pd.DataFrame, movies: pd.DataFrame) -> PreparedData:
-    df = ratings.copy()
-    df.rename(columns={"userId":"user_id","movieId":"item_id"}, inplace=True)
-    df["ts"] = pd.to_datetime(df["timestamp"], unit="s")
     # Build engagement events from ratings:
-    # every rating -> a "view"; rating>=4 -> also "like" with high prob
-    views = df[["user_id","item_id","ts"]].copy()
-    views["event"] = "view"
-    likes = df[df["rating"] >= 4][["user_id","item_id","ts"]].copy()
-    likes["event"] = "like"
-    # Optional: simulate "comment" or "share" sparsely
-    rng = np.random.default_rng(42)
-    maybe_comment = df[df["rating"] >= 4.5][["user_id","item_id","ts"]].copy()
-    maybe_comment["event"] = "comment"
-    # concat
-    events = pd.concat([views, likes, maybe_comment], ignore_index=True)
-    events = events.sort_values("ts").reset_index(drop=True)
-    # normalize types
-    events["user_id"] = events["user_id"].astype(int)
-    events["item_id"] = events["item_id"].astype(int)
+    # every rating -> a "view"; rating>=4 -> also "like"; rating>=4.5 -> also "comment"
+    r = ratings["rating"].values
+    uid = ratings["userId"].values
+    iid = ratings["movieId"].values
+    # unix seconds -> datetime64[ns] is a pure int64 scale; the i8 buffer is
+    # shared zero-copy with the datetime view consumers see
+    ts = (ratings["timestamp"].values.astype(np.int64) * 1_000_000_000).view("M8[ns]")
+    m_like = r >= 4
+    m_comment = r >= 4.5
+    n_views, n_likes, n_comments = len(r), int(m_like.sum()), int(m_comment.sum())
+    n = n_views + n_likes + n_comments
+    # Fill pre-sized output arrays slice by slice instead of concat'ing
+    # three intermediate DataFrames; event is a uint8 code (view/like/comment).
+    out_uid = np.empty(n, dtype=uid.dtype)
+    out_iid = np.empty(n, dtype=iid.dtype)
+    out_ts = np.empty(n, dtype=ts.dtype)
+    out_event = np.empty(n, dtype=np.uint8)
+    for lo, hi, u, i, t, code in (
+        (0, n_views, uid, iid, ts, 0),
+        (n_views, n_views + n_likes, uid[m_like], iid[m_like], ts[m_like], 1),
+        (n_views + n_likes, n, uid[m_comment], iid[m_comment], ts[m_comment], 2),
+    ):
+        out_uid[lo:hi] = u
+        out_iid[lo:hi] = i
+        out_ts[lo:hi] = t
+        out_event[lo:hi] = code
+    order = np.argsort(out_ts, kind="stable")
+    events = pd.DataFrame({
+        "user_id": out_uid[order],
+        "item_id": out_iid[order],
+        "ts": out_ts[order],
+        "event": pd.Categorical.from_codes(out_event[order], EVENT_CATEGORIES),
+    })
     users = users.rename(columns={"userId":"user_id"}).copy()
     movies = movies.rename(columns={"movieId":"item_id"}).copy()
     return PreparedData(events=events, users=users, movies=movies)
 
 def build_cohorts(events: pd.DataFrame, period: str = "W") -> pd.DataFrame:
     # cohort = user's first event period; retention = active in subsequent periods
-    ev = events.copy()
-    ev["period"] = ev["ts"].dt.to_period(period).dt.start_time
-    first = ev.groupby("user_id")["period"].min().rename("cohort")
-    ev = ev.merge(first, on="user_id", how="left")
-    retention = (ev
-        .groupby(["cohort","period"])["user_id"].nunique()
-        .rename("active_users")
-        .reset_index())
-    # cohort sizes
-    sizes = retention[retention["period"] == retention["cohort"]][["cohort","active_users"]].rename(columns={"active_users":"cohort_size"})
-    out = retention.merge(sizes, on="cohort", how="left")
-    out["retention_rate"] = out["active_users"] / out["cohort_size"]
-    return out.sort_values(["cohort","period"])
-
-def build_funnel(events: pd.DataFrame) -> pd.DataFrame:
-    # Simple funnel over first 7 days from cohort start:
-    # Step1: any view   Step2: >=5 views in 3d ("activation")  Step3: return in day 7 ("week1_retention")
-    ev = events.copy()
-    first_ts = ev.groupby("user_id")["ts"].min().rename("t0")
-    ev = ev.merge(first_ts, on="user_id", how="left")
-    ev["days_since"] = (ev["ts"] - ev["t0"]).dt.total_seconds() / SECONDS_PER_DAY
+    # Dense cohort x period count matrix from integer codes: one np.unique to
+    # dedupe (period, user) pairs + one bincount, instead of two
+    # groupby.nunique passes and a merge.
+    period_vals = events["ts"].dt.to_period(period).dt.start_time.values
+    period_codes, period_uniques = pd.factorize(period_vals, sort=True)
+    user_codes, user_uniques = pd.factorize(events["user_id"].values, sort=False)
+    n_periods, n_users = len(period_uniques), len(user_uniques)
 
-    users = ev[["user_id","t0"]].drop_duplicates()
-    step1 = users.assign(step1=1)
+    cohort_of_user = np.full(n_users, n_periods, dtype=np.int64)
+    np.minimum.at(cohort_of_user, user_codes, period_codes)
 
-    activated = (ev[(ev["event"]=="view") & (ev["days_since"]<=3.0)]
-                 .groupby("user_id").size().rename("views_3d").reset_index())
-    step2_users = activated[activated["views_3d"]>=5][["user_id"]].assign(step2=1)
+    uniq_pairs = np.unique(period_codes.astype(np.int64) * n_users + user_codes)
+    p_of = uniq_pairs // n_users
+    c_of = cohort_of_user[uniq_pairs % n_users]
+    counts = np.bincount(c_of * n_periods + p_of,
+                         minlength=n_periods * n_periods).reshape(n_periods, n_periods)
 
-    week1 = (ev[(ev["days_since"]>=7.0) & (ev["days_since"]<8.0)]
-             .groupby("user_id").size().rename("events_day7").reset_index())
-    step3_users = week1[week1["events_day7"]>0][["user_id"]].assign(step3=1)
+    # active (cohort, period) cells; np.nonzero is row-major, i.e. already
+    # sorted by cohort then period. Cohort size sits on the diagonal.
+    ci, pj = np.nonzero(counts)
+    cell = counts[ci, pj]
+    size = counts[ci, ci]
+    return pd.DataFrame({
+        "cohort": period_uniques[ci],
+        "period": period_uniques[pj],
+        "active_users": cell,
+        "cohort_size": size,
+        "retention_rate": cell / size,
+    })
 
-    df = users.merge(step1, on="user_id", how="left") \
-              .merge(step2_users, on="user_id", how="left") \
-              .merge(step3_users, on="user_id", how="left") \
-              .fillna(0)
+def build_funnel(events: pd.DataFrame) -> pd.DataFrame:
+    # Simple funnel over first 7 days from cohort start:
+    # Step1: any view   Step2: >=5 views in 3d ("activation")  Step3: return in day 7 ("week1_retention")
+    # One pass over contiguous per-user blocks via np.add.reduceat instead of
+    # three groupby/size + merge rounds.
+    codes, uniques = pd.factorize(events["user_id"].values, sort=False)
+    ts_i8 = events["ts"].values.view("i8")
+    t0 = np.full(len(uniques), np.iinfo("i8").max, dtype="i8")
+    np.minimum.at(t0, codes, ts_i8)
+    days_since = (ts_i8 - t0[codes]) / NS_PER_DAY
 
+    view_code = events["event"].cat.categories.get_loc("view")
+    n_users = len(uniques)
+    views_3d, events_d7, _ = funnel_counts(
+        codes, days_since, events["event"].cat.codes.values, view_code, n_users
+    )
     totals = pd.DataFrame({
         "step": ["signup","activation(5 views in 3d)","day7_retention"],
-        "users": [df["step1"].sum(), df["step2"].sum(), df["step3"].sum()]
+        "users": [n_users, int((views_3d >= 5).sum()), int((events_d7 > 0).sum())]
     })
     totals["rate_vs_signup"] = totals["users"] / totals["users"].iloc[0]
     return totals
 
 def product_kpis(events: pd.DataFrame) -> Dict[str, float]:
-    ev = events.copy()
-    ev["date"] = ev["ts"].dt.date
-    dau = ev.groupby("date")["user_id"].nunique().rename("DAU").to_frame()
-    dau["MAU_rolling"] = ev.set_index("ts")["user_id"].groupby(pd.Grouper(freq="D")).nunique().rolling(30, min_periods=1).mean().values
+    # DAU via one np.unique over (day, user) integer pairs + bincount, instead
+    # of per-group set allocation in groupby(...).nunique().
+    days = events["ts"].values.view("i8") // NS_PER_DAY
+    day_off = (days - days[0]).astype(np.int64)        # events are ts-sorted
+    uid = events["user_id"].values.astype(np.int64)
+    span = uid.max() + 1
+    uniq_pairs = np.unique(day_off * span + uid)
+    dau_dense = np.bincount(uniq_pairs // span, minlength=day_off[-1] + 1)  # zeros on empty days
+    # per-day event counts from searchsorted slice offsets on the sorted days
+    boundaries = np.arange(day_off[-1] + 2)
+    events_per_day = np.diff(np.searchsorted(day_off, boundaries))
+    active = dau_dense > 0
+
+    # 30-day rolling mean of DAU (min_periods=1) via the cumsum trick
+    cum = np.concatenate([[0.0], np.cumsum(dau_dense, dtype=np.float64)])
+    idx = np.arange(len(dau_dense))
+    lo = np.maximum(idx - 29, 0)
+    mau_rolling = (cum[idx + 1] - cum[lo]) / (idx + 1 - lo)
+
+    avg_dau = float(dau_dense[active].mean())
     kpis = {
-        "avg_DAU": float(dau["DAU"].mean()),
-        "peak_DAU": float(dau["DAU"].max()),
-        "DAU/MAU_proxy": float(dau["DAU"].mean() / (dau["MAU_rolling"].mean() + 1e-9)),
-        "avg_daily_events": float(ev.groupby("date").size().mean())
+        "avg_DAU": avg_dau,
+        "peak_DAU": float(dau_dense.max()),
+        "DAU/MAU_proxy": float(avg_dau / (mau_rolling.mean() + 1e-9)),
+        "avg_daily_events": float(events_per_day[active].mean())
     }
     return kpis
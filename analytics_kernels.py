@@ -0,0 +1,59 @@
+"""Numba-accelerated per-user reducers for analytics.py.
+
+Numba is optional: when it is missing (or fails to import), callers get a
+pure-NumPy fallback with identical results, so the app still runs from the
+base requirements alone.
+"""
+import numpy as np
+
+try:
+    import numba
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, cache=True)
+    def _funnel_kernel(codes, days_since, event_code, view_code, n_users):
+        # One parallel pass over events; per-thread buffers avoid atomics,
+        # reduced across threads at the end.
+        nthreads = numba.get_num_threads()
+        local_3d = np.zeros((nthreads, n_users), dtype=np.int64)
+        local_d7 = np.zeros((nthreads, n_users), dtype=np.int64)
+        local_any = np.zeros((nthreads, n_users), dtype=np.int64)
+        n = len(codes)
+        chunk = (n + nthreads - 1) // nthreads
+        for t in prange(nthreads):
+            lo = t * chunk
+            hi = min(lo + chunk, n)
+            for i in range(lo, hi):
+                u = codes[i]
+                d = days_since[i]
+                local_any[t, u] += 1
+                if event_code[i] == view_code and d <= 3.0:
+                    local_3d[t, u] += 1
+                if 7.0 <= d < 8.0:
+                    local_d7[t, u] += 1
+        return local_3d.sum(axis=0), local_d7.sum(axis=0), local_any.sum(axis=0)
+
+
+def _funnel_numpy(codes, days_since, event_code, view_code, n_users):
+    in_3d = (event_code == view_code) & (days_since <= 3.0)
+    in_day7 = (days_since >= 7.0) & (days_since < 8.0)
+    views_3d = np.bincount(codes[in_3d], minlength=n_users)
+    events_d7 = np.bincount(codes[in_day7], minlength=n_users)
+    has_any = np.bincount(codes, minlength=n_users)
+    return views_3d, events_d7, has_any
+
+
+def funnel_counts(codes, days_since, event_code, view_code, n_users):
+    """Per-user (views_in_3d, events_in_day7, total_events) counters.
+
+    codes: factorized user ids (0..n_users-1), days_since: float days from
+    the user's first event, event_code: int8 categorical codes.
+    """
+    if NUMBA_AVAILABLE:
+        return _funnel_kernel(codes, days_since, event_code, view_code, n_users)
+    return _funnel_numpy(codes, days_since, event_code, view_code, n_users)
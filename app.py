@@ -1,7 +1,9 @@
+from functools import lru_cache
 from pathlib import Path
 import gradio as gr
 import pandas as pd
 import plotly.express as px
+import plotly.graph_objects as go
 
 from data_download import download_movielens, DATA_DIR
 from analytics import (
@@ -16,8 +18,8 @@ from ab_test import (
     simulate_treatment_effect,
     ttest_and_ci,
     srm_check,
-    cuped_adjust,
 )
+from ab_kernels import cuped_welch
 
 # -----------------------
 # Helpers
@@ -38,16 +40,53 @@ def _read_uploaded_csv(upload) -> pd.DataFrame:
         return _read_any(upload.name)
     raise ValueError("Unsupported upload type; please upload a CSV file.")
 
+def _events_preview(events: pd.DataFrame, n: int = 1000) -> pd.DataFrame:
+    """Small JSON-friendly head for gr.Dataframe: pre-stringified ts and
+    event so Gradio's marshalling skips the datetime/categorical roundtrip."""
+    e = events.head(n).copy()
+    e["ts"] = e["ts"].dt.strftime("%Y-%m-%d %H:%M:%S")
+    e["event"] = e["event"].astype(str)
+    return e
+
+RATINGS_DTYPES = {
+    "userId": "int32",
+    "movieId": "int32",
+    "rating": "float32",
+    "timestamp": "int64",
+}
+
 def ensure_data():
-    """Ensure MovieLens CSVs exist; return (ratings, users, movies, err)."""
+    """Ensure MovieLens data exists; return (ratings_path, mtime_ns, err).
+
+    Prefers the Parquet cache (columnar, dtype-preserving, ~10x faster to
+    load) and falls back to the CSV when only a legacy cache is present.
+    """
     try:
         download_movielens()
-        ratings = pd.read_csv(DATA_DIR / "ratings.csv")
-        users   = pd.read_csv(DATA_DIR / "users.csv")
-        movies  = pd.read_csv(DATA_DIR / "movies.csv")
-        return ratings, users, movies, None
+        ratings_pq = DATA_DIR / "ratings.parquet"
+        ratings_path = ratings_pq if ratings_pq.exists() else DATA_DIR / "ratings.csv"
+        return ratings_path, ratings_path.stat().st_mtime_ns, None
     except Exception as e:
-        return None, None, None, f"Download/parse failed: {e}"
+        return None, None, f"Download/parse failed: {e}"
+
+def _read_table(stem: str) -> pd.DataFrame:
+    pq = DATA_DIR / f"{stem}.parquet"
+    if pq.exists():
+        return pd.read_parquet(pq)
+    return pd.read_csv(DATA_DIR / f"{stem}.csv")
+
+@lru_cache(maxsize=2)
+def _prepare_cached(ratings_path: str, mtime_ns: int):
+    """Memoized parse+prepare keyed on the ratings file path and mtime,
+    so slider moves and tab switches reuse one in-memory PreparedData."""
+    p = Path(ratings_path)
+    if p.suffix == ".parquet":
+        ratings = pd.read_parquet(p)
+    else:
+        ratings = pd.read_csv(p, dtype=RATINGS_DTYPES)
+    users = _read_table("users")
+    movies = _read_table("movies")
+    return prepare_events(ratings, users, movies)
 
 # -----------------------
 # Build analytics views
@@ -58,20 +97,24 @@ def build_all(upload: gr.File | None):
             ratings = _read_uploaded_csv(upload)
             users = pd.DataFrame({"userId": ratings["userId"].unique()})
             movies = pd.DataFrame({"movieId": ratings["movieId"].unique()})
-            err = None
+            pdata = prepare_events(ratings, users, movies)
         else:
-            ratings, users, movies, err = ensure_data()
-        if err:
-            return None, None, None, None, gr.update(value=f"❌ {err}")
-
-        pdata = prepare_events(ratings, users, movies)
+            ratings_path, mtime_ns, err = ensure_data()
+            if err:
+                return None, None, None, None, gr.update(value=f"❌ {err}")
+            pdata = _prepare_cached(str(ratings_path), mtime_ns)
         kpis = product_kpis(pdata.events)
 
         cohorts = build_cohorts(pdata.events, period="W")
-        cohort_fig = px.line(
-            cohorts, x="period", y="retention_rate", color="cohort",
-            title="Weekly Retention by Cohort"
-        )
+        # Scattergl traces straight from the column arrays: skips px.line's
+        # frame-to-dict conversion and renders 10^5+ points via WebGL
+        cohort_fig = go.Figure([
+            go.Scattergl(x=g["period"].values, y=g["retention_rate"].values,
+                         name=str(c.date()), mode="lines")
+            for c, g in cohorts.groupby("cohort", sort=False)
+        ])
+        cohort_fig.update_layout(title="Weekly Retention by Cohort",
+                                 uirevision="cohorts")  # keep client zoom across rebuilds
 
         funnel = build_funnel(pdata.events)
         funnel_fig = px.bar(
@@ -86,7 +129,7 @@ def build_all(upload: gr.File | None):
             f"**Avg Daily Events:** {kpis['avg_daily_events']:.0f}"
         )
 
-        return pdata.events.head(1000), cohort_fig, funnel_fig, kpi_txt, gr.update(value="✅ Data ready.")
+        return _events_preview(pdata.events), cohort_fig, funnel_fig, kpi_txt, gr.update(value="✅ Data ready.")
     except Exception as e:
         return None, None, None, None, gr.update(value=f"❌ Error: {e}")
 
@@ -95,11 +138,11 @@ def build_all(upload: gr.File | None):
 # -----------------------
 def run_experiment(lift_pct, seed):
     try:
-        # 1) Load data & events
-        ratings, users, movies, err = ensure_data()
+        # 1) Load data & events (cache hit after the first run)
+        ratings_path, mtime_ns, err = ensure_data()
         if err:
             return f"❌ {err}", None, pd.DataFrame()
-        pdata = prepare_events(ratings, users, movies)
+        pdata = _prepare_cached(str(ratings_path), mtime_ns)
 
         # 2) Variant assignment
         assignments = random_assign_users(
@@ -124,22 +167,20 @@ def run_experiment(lift_pct, seed):
         # Guarantee required cols
         if "variant" not in df.columns:
             df = df.merge(assignments, on="user_id", how="left")
-        df["variant"] = df["variant"].fillna("C").astype(str)
+        df["variant"] = df["variant"].fillna("C")  # keep the int8-coded categorical
         if "y" not in df.columns:
             df["y"] = pd.to_numeric(df.get("views_w7", 0), errors="coerce").fillna(0.0)
 
         df["y"] = pd.to_numeric(df["y"], errors="coerce").fillna(0.0)
         df["pre_views"] = pd.to_numeric(df.get("pre_views", 0), errors="coerce").fillna(0.0)
 
-        # 5) Plain stats — use a trimmed DF with exactly one 'y'
-        df_plain = df[["user_id", "variant", "y"]].copy()
-        res_plain = ttest_and_ci(df_plain)
+        # 5) Plain stats — metric and variant codes extracted once
+        y = df["y"].values
+        variant_code = df["variant"].cat.codes.values
+        res_plain = ttest_and_ci(y, variant_code)
 
-        # 6) CUPED stats — build a separate DF (no duplicate 'y')
-        df_cuped = df[["user_id", "variant", "pre_views", "y"]].copy()
-        df_cuped["y"] = cuped_adjust(df_cuped["y"], df_cuped["pre_views"])
-        df_cuped = df_cuped[["user_id", "variant", "y"]]  # only one 'y'
-        res_cuped = ttest_and_ci(df_cuped)
+        # 6) CUPED stats — fused adjust+Welch kernel, no intermediate frames
+        res_cuped = cuped_welch(y, df["pre_views"].values, variant_code)
 
         def pretty(res, tag):
             return (
@@ -162,6 +203,7 @@ def run_experiment(lift_pct, seed):
         )
 
         # 7) Plot on the plain metric
+        df_plain = df[["user_id", "variant", "y"]]
         fig = px.histogram(
             df_plain, x="y", color="variant", nbins=40, barmode="overlay", opacity=0.6,
             title="User Metric Distribution (views in first 7d)"
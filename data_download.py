@@ -1,3 +1,4 @@
+import csv
 import io
 import zipfile
 from pathlib import Path
@@ -11,18 +12,61 @@ DATA_DIR.mkdir(exist_ok=True)
 ML1M_URL = "https://files.grouplens.org/datasets/movielens/ml-1m.zip"
 DEST = DATA_DIR / "ml-1m.zip"
 
+# One dtype map per table, shared by the fresh-download parse and the legacy
+# CSV->Parquet upgrade so cached dtypes don't depend on install history.
+TABLE_DTYPES = {
+    "ratings": {"userId": "int32", "movieId": "int32",
+                "rating": "float32", "timestamp": "int64"},
+    "users": {"userId": "int32", "age": "int16", "occupation": "int16"},
+    "movies": {"movieId": "int32"},
+}
+
+
+def _read_dat(z: zipfile.ZipFile, member: str, names, dtype=None) -> pd.DataFrame:
+    """Parse a '::'-delimited .dat member with the C engine.
+
+    pandas' python engine is the only one that accepts multi-char separators,
+    so rewrite '::' to tabs at the byte level first; none of the ML-1M fields
+    contain tabs, and QUOTE_NONE keeps double quotes in titles (e.g.
+    '"Great Performances" Cats (1998)') as literal bytes, matching the old
+    regex-separator split. ~5-10x faster than engine='python'.
+    """
+    raw = z.read(member).replace(b"::", b"\t")
+    return pd.read_csv(
+        io.BytesIO(raw),
+        sep="\t",
+        engine="c",
+        encoding="latin-1",
+        names=names,
+        dtype=dtype,
+        quoting=csv.QUOTE_NONE,
+    )
+
 
 def download_movielens():
     """
-    Downloads MovieLens 1M and converts the latin-1 encoded .dat files
-    into UTF-8 CSVs saved under data/ (ratings.csv, users.csv, movies.csv).
-    Safe to call repeatedly; it will skip work if CSVs already exist.
+    Downloads MovieLens 1M and saves the latin-1 encoded .dat files under
+    data/ as snappy Parquet (the fast, dtype-preserving source of truth)
+    plus UTF-8 CSVs for portability. Safe to call repeatedly; it skips work
+    if the Parquet files exist and upgrades a legacy CSV-only cache in
+    place without re-downloading.
     """
     ratings_csv = DATA_DIR / "ratings.csv"
     users_csv = DATA_DIR / "users.csv"
     movies_csv = DATA_DIR / "movies.csv"
+    parquets = [DATA_DIR / f"{stem}.parquet" for stem in ("ratings", "users", "movies")]
 
+    if all(p.exists() for p in parquets):
+        return
     if ratings_csv.exists() and users_csv.exists() and movies_csv.exists():
+        # legacy CSV-only cache: upgrade to Parquet without re-downloading,
+        # pinning the same dtypes a fresh download would parse with
+        for stem, csv_path, pq_path in zip(
+            ("ratings", "users", "movies"), (ratings_csv, users_csv, movies_csv), parquets
+        ):
+            pd.read_csv(csv_path, dtype=TABLE_DTYPES[stem]).to_parquet(
+                pq_path, engine="pyarrow", compression="snappy"
+            )
         return
 
     print("Downloading MovieLens 1M...")
@@ -32,36 +76,34 @@ def download_movielens():
 
     # MovieLens .dat files are latin-1 (titles contain accented chars)
     with zipfile.ZipFile(io.BytesIO(r.content)) as z:
-        with z.open("ml-1m/ratings.dat") as f:
-            ratings = pd.read_csv(
-                f,
-                sep="::",
-                engine="python",
-                encoding="latin-1",
-                names=["userId", "movieId", "rating", "timestamp"],
-            )
-        with z.open("ml-1m/users.dat") as f:
-            users = pd.read_csv(
-                f,
-                sep="::",
-                engine="python",
-                encoding="latin-1",
-                names=["userId", "gender", "age", "occupation", "zip"],
-            )
-        with z.open("ml-1m/movies.dat") as f:
-            movies = pd.read_csv(
-                f,
-                sep="::",
-                engine="python",
-                encoding="latin-1",
-                names=["movieId", "title", "genres"],
-            )
+        ratings = _read_dat(
+            z,
+            "ml-1m/ratings.dat",
+            names=["userId", "movieId", "rating", "timestamp"],
+            dtype=TABLE_DTYPES["ratings"],
+        )
+        users = _read_dat(
+            z,
+            "ml-1m/users.dat",
+            names=["userId", "gender", "age", "occupation", "zip"],
+            dtype=TABLE_DTYPES["users"],
+        )
+        movies = _read_dat(
+            z,
+            "ml-1m/movies.dat",
+            names=["movieId", "title", "genres"],
+            dtype=TABLE_DTYPES["movies"],
+        )
 
-    # Save normalized UTF-8 CSVs
-    ratings.to_csv(ratings_csv, index=False, encoding="utf-8")
-    users.to_csv(users_csv, index=False, encoding="utf-8")
-    movies.to_csv(movies_csv, index=False, encoding="utf-8")
-    print("Saved data to data/ (UTF-8 CSVs).")
+    # Save normalized UTF-8 CSVs (portable) plus Parquet (fast, dtype-preserving)
+    for df, csv_path, pq_path in (
+        (ratings, ratings_csv, parquets[0]),
+        (users, users_csv, parquets[1]),
+        (movies, movies_csv, parquets[2]),
+    ):
+        df.to_csv(csv_path, index=False, encoding="utf-8")
+        df.to_parquet(pq_path, engine="pyarrow", compression="snappy")
+    print("Saved data to data/ (UTF-8 CSVs + Parquet).")
 
 
 if __name__ == "__main__":